@@ -1,11 +1,11 @@
-import time
+import os
+
 import pandas as pd
 import streamlit as st
 from streamlit_autorefresh import st_autorefresh
 
-from simulator import generate_vitals
-from risk_engine import RollingWindow, patient_thresholds, classify_level, infer_outcomes
-from storage import init_db, save_vital, save_event, load_events
+from storage import init_db, WriteBuffer, load_events
+from ticker import PatientTicker
 
 st.set_page_config(page_title="Risk Trajectory", layout="wide")
 
@@ -117,16 +117,26 @@ PATIENTS = [
     {"id": "P004", "name": "Patient 004", "profile": "critical",     "age": 70},
 ]
 
-# ---- DB session ----
-Session = init_db("sqlite:///risk_trajectory.db")
+# ---- Persistence is a server setting: tickers and the DB are shared by all sessions ----
+PERSIST_DB = os.environ.get("RISK_TRAJECTORY_PERSIST", "1") != "0"
+# mixed with each patient id to seed its simulator stream; change it for a different (still reproducible) run
+SIM_SEED = int(os.environ.get("RISK_TRAJECTORY_SEED", "0"))
+
+# ---- DB session (one engine + write buffer per server process) ----
+@st.cache_resource
+def get_db():
+    Session = init_db("sqlite:///risk_trajectory.db")
+    writer  = WriteBuffer(Session)
+    return Session, writer
+
+Session, writer = get_db()
 
-# ---- Session state init ----
-if "sim_state" not in st.session_state:
-    st.session_state.sim_state = {}
-if "windows" not in st.session_state:
-    st.session_state.windows = {}
-if "history" not in st.session_state:
-    st.session_state.history = {}
+# ---- Background tickers (one per patient, shared by all sessions) ----
+@st.cache_resource
+def get_ticker(patient_id: str, profile: str) -> PatientTicker:
+    ticker = PatientTicker(patient_id, profile, writer, interval_s=1.0, seed=SIM_SEED, persist=PERSIST_DB)
+    ticker.start()
+    return ticker
 
 # ---- Sidebar controls ----
 st.sidebar.title("Controls")
@@ -145,52 +155,20 @@ patient = next(p for p in PATIENTS if p["id"] == patient_id)
 
 auto        = st.sidebar.toggle("Live monitoring", value=True)
 interval_ms = st.sidebar.slider("Refresh interval (ms)", 500, 5000, 1000, step=250)
-persist_db  = st.sidebar.toggle("Persist to SQLite", value=True)
 
 st.sidebar.caption("If the page feels static, keep Live monitoring ON.")
+st.sidebar.caption(f"SQLite persistence: {'on' if PERSIST_DB else 'off'} (server setting RISK_TRAJECTORY_PERSIST)")
 
 if auto:
     st_autorefresh(interval=interval_ms, key="rt_refresh")
 
-if patient_id not in st.session_state.windows:
-    st.session_state.windows[patient_id]   = RollingWindow(maxlen=120)
-if patient_id not in st.session_state.sim_state:
-    st.session_state.sim_state[patient_id] = {}
-if patient_id not in st.session_state.history:
-    st.session_state.history[patient_id]   = []
-
-# ---- Generate next vitals tick ----
-vitals  = generate_vitals(patient["profile"], st.session_state.sim_state[patient_id])
-st.session_state.windows[patient_id].push(vitals)
-rates   = st.session_state.windows[patient_id].rates_per_min()
-
-th                    = patient_thresholds(patient["profile"])
-level, reasons, score = classify_level(vitals, th, rates)
-outcomes              = infer_outcomes(vitals, level, reasons)
-
-title_map = {"green": "Stable", "yellow": "Warning", "orange": "High Risk", "red": "CRITICAL ALERT"}
-title   = title_map[level]
-explain = " | ".join(reasons[:4]) if reasons else "No abnormalities detected."
-
-row = {
-    "ts": pd.Timestamp.utcnow().isoformat(),
-    "level": level,
-    "risk_score": round(score, 1),
-    **vitals,
-    "d_hr_per_min":   round(rates["heart_rate"],        2),
-    "d_spo2_per_min": round(rates["oxygen_saturation"], 2),
-    "d_sys_per_min":  round(rates["bp_systolic"],       2),
-    "d_temp_per_min": round(rates["temperature"],       2),
-}
-
-st.session_state.history[patient_id].append(row)
-st.session_state.history[patient_id] = st.session_state.history[patient_id][-300:]
-
-if persist_db:
-    save_vital(Session, patient_id, vitals)
-    if level in ("yellow", "orange", "red"):
-        save_event(Session, patient_id, level, title, explain,
-                   {"vitals": vitals, "rates": rates, "outcomes": outcomes})
+# ---- Latest snapshot from the background ticker ----
+ticker = get_ticker(patient_id, patient["profile"])
+snap, df_hist = ticker.snapshot(last=100)
+
+vitals, rates, outcomes = snap["vitals"], snap["rates"], snap["outcomes"]
+level, score            = snap["level"], snap["score"]
+title, explain          = snap["title"], snap["explain"]
 
 # ---- UI ----
 st.title("Risk Trajectory")
@@ -236,15 +214,33 @@ with right:
         st.write("No predicted outcomes.")
 
 st.subheader("Event Timeline (latest 50)")
-if persist_db:
+if PERSIST_DB:
+    if writer.events_buf:
+        # let the drainer write it (with its retry/backoff) rather than block this rerun on
+        # SQLite; a raised alert shows up in the timeline by the next refresh
+        writer.request_flush()
     events = load_events(Session, patient_id, limit=50)
-    if events:
+    if events["ts"]:
         st.dataframe(pd.DataFrame(events), use_container_width=True, hide_index=True)
     else:
         st.info("No events yet.")
 else:
-    st.info("Enable 'Persist to SQLite' to store and view timeline.")
+    st.info("SQLite persistence is off on this server (RISK_TRAJECTORY_PERSIST=0); no timeline is stored.")
 
 st.subheader("Vitals History (last 100)")
-df_hist = pd.DataFrame(st.session_state.history[patient_id][-100:])
-st.dataframe(df_hist, use_container_width=True, hide_index=True)
+df_hist["ts"] = pd.to_datetime(df_hist["ts"], unit="s", utc=True)
+st.dataframe(
+    df_hist, use_container_width=True, hide_index=True,
+    column_config={
+        "risk_score":        st.column_config.NumberColumn(format="%.1f"),
+        "heart_rate":        st.column_config.NumberColumn(format="%.1f"),
+        "bp_systolic":       st.column_config.NumberColumn(format="%.1f"),
+        "bp_diastolic":      st.column_config.NumberColumn(format="%.1f"),
+        "oxygen_saturation": st.column_config.NumberColumn(format="%.1f"),
+        "temperature":       st.column_config.NumberColumn(format="%.2f"),
+        "d_hr_per_min":      st.column_config.NumberColumn(format="%.2f"),
+        "d_spo2_per_min":    st.column_config.NumberColumn(format="%.2f"),
+        "d_sys_per_min":     st.column_config.NumberColumn(format="%.2f"),
+        "d_temp_per_min":    st.column_config.NumberColumn(format="%.2f"),
+    },
+)
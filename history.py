@@ -0,0 +1,40 @@
+from typing import Dict, Any
+import numpy as np
+import pandas as pd
+
+# numeric columns of a dashboard history row, in display order (after ts, level)
+HISTORY_COLUMNS = (
+    "risk_score",
+    "heart_rate", "bp_systolic", "bp_diastolic", "oxygen_saturation", "temperature",
+    "d_hr_per_min", "d_spo2_per_min", "d_sys_per_min", "d_temp_per_min",
+)
+
+class HistoryRing:
+    """
+    Fixed-size ring buffer of history rows stored column-wise (one
+    preallocated array per field) so rendering never rebuilds row dicts.
+    """
+    def __init__(self, size: int = 300):
+        self.size = size
+        self.cols = {c: np.empty(size, dtype=np.float64) for c in HISTORY_COLUMNS}
+        self.ts = np.empty(size, dtype=np.float64)   # epoch seconds
+        self.level = np.empty(size, dtype="U8")
+        self.cursor = 0
+
+    def append(self, row: Dict[str, Any]):
+        i = self.cursor % self.size
+        self.ts[i] = row["ts"]
+        self.level[i] = row["level"]
+        for c, arr in self.cols.items():
+            arr[i] = row[c]
+        self.cursor += 1
+
+    def __len__(self) -> int:
+        return min(self.cursor, self.size)
+
+    def to_frame(self, last: int | None = None) -> pd.DataFrame:
+        n = len(self) if last is None else min(len(self), last)
+        idx = np.arange(self.cursor - n, self.cursor) % self.size   # oldest -> newest
+        data = {"ts": self.ts[idx], "level": self.level[idx]}
+        data.update((c, arr[idx]) for c, arr in self.cols.items())
+        return pd.DataFrame(data)
@@ -1,9 +1,13 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, astuple
 from collections import deque
 from typing import Dict, Any, List, Tuple
 import time
 
-@dataclass
+import numba as nb
+import numpy as np
+from numba import njit
+
+@dataclass(frozen=True)
 class Thresholds:
     hr_red: float
     spo2_red: float
@@ -19,140 +23,223 @@ class Thresholds:
     temp_yellow_hi: float
     temp_yellow_lo: float
 
-def patient_thresholds(profile: str) -> Thresholds:
-    if profile == "athlete":
-        return Thresholds(
-            hr_red=140, spo2_red=92, sys_red=170, dia_red=110, temp_red_hi=39.0, temp_red_lo=35.0,
-            hr_yellow=105, spo2_yellow=95, sys_yellow=145, dia_yellow=95, temp_yellow_hi=38.0, temp_yellow_lo=36.0
-        )
-    if profile == "hypertensive":
-        return Thresholds(
-            hr_red=150, spo2_red=92, sys_red=180, dia_red=120, temp_red_hi=39.0, temp_red_lo=35.0,
-            hr_yellow=110, spo2_yellow=95, sys_yellow=155, dia_yellow=100, temp_yellow_hi=38.0, temp_yellow_lo=36.0
-        )
-    if profile == "critical":
-        return Thresholds(
-            hr_red=135, spo2_red=90, sys_red=165, dia_red=105, temp_red_hi=39.0, temp_red_lo=35.0,
-            hr_yellow=105, spo2_yellow=94, sys_yellow=145, dia_yellow=95, temp_yellow_hi=38.0, temp_yellow_lo=36.0
-        )
-    return Thresholds(
+_THRESHOLDS_BY_PROFILE: Dict[str, Thresholds] = {
+    "athlete": Thresholds(
+        hr_red=140, spo2_red=92, sys_red=170, dia_red=110, temp_red_hi=39.0, temp_red_lo=35.0,
+        hr_yellow=105, spo2_yellow=95, sys_yellow=145, dia_yellow=95, temp_yellow_hi=38.0, temp_yellow_lo=36.0
+    ),
+    "hypertensive": Thresholds(
+        hr_red=150, spo2_red=92, sys_red=180, dia_red=120, temp_red_hi=39.0, temp_red_lo=35.0,
+        hr_yellow=110, spo2_yellow=95, sys_yellow=155, dia_yellow=100, temp_yellow_hi=38.0, temp_yellow_lo=36.0
+    ),
+    "critical": Thresholds(
+        hr_red=135, spo2_red=90, sys_red=165, dia_red=105, temp_red_hi=39.0, temp_red_lo=35.0,
+        hr_yellow=105, spo2_yellow=94, sys_yellow=145, dia_yellow=95, temp_yellow_hi=38.0, temp_yellow_lo=36.0
+    ),
+    "normal": Thresholds(
         hr_red=150, spo2_red=92, sys_red=170, dia_red=110, temp_red_hi=39.0, temp_red_lo=35.0,
         hr_yellow=110, spo2_yellow=95, sys_yellow=150, dia_yellow=95, temp_yellow_hi=38.0, temp_yellow_lo=36.0
-    )
+    ),
+}
+
+def patient_thresholds(profile: str) -> Thresholds:
+    return _THRESHOLDS_BY_PROFILE.get(profile, _THRESHOLDS_BY_PROFILE["normal"])
+
+# (vital key, look-back seconds) used for the rate-of-change signals
+_RATE_WINDOWS = (
+    ("heart_rate", 60.0),
+    ("bp_systolic", 120.0),
+    ("oxygen_saturation", 60.0),
+    ("temperature", 300.0),
+)
 
 class RollingWindow:
     def __init__(self, maxlen: int = 120):
-        self.data = deque(maxlen=maxlen)  # (t_epoch, vitals)
+        self.ts = deque(maxlen=maxlen)
+        self.hr = deque(maxlen=maxlen)
+        self.spo2 = deque(maxlen=maxlen)
+        self.sys = deque(maxlen=maxlen)
+        self.dia = deque(maxlen=maxlen)
+        self.temp = deque(maxlen=maxlen)
+        self._series = {
+            "heart_rate": self.hr,
+            "bp_systolic": self.sys,
+            "oxygen_saturation": self.spo2,
+            "temperature": self.temp,
+        }
+        # per key: index of the newest sample that is at least `seconds` old
+        self._ref_idx = {key: 0 for key, _ in _RATE_WINDOWS}
 
     def push(self, vitals: Dict[str, float], t_epoch: float | None = None):
-        self.data.append((t_epoch or time.time(), vitals))
-
-    def _rate_per_min(self, key: str, seconds: float) -> float:
-        if len(self.data) < 2:
+        evicting = len(self.ts) == self.ts.maxlen
+        self.ts.append(t_epoch or time.time())
+        self.hr.append(vitals["heart_rate"])
+        self.spo2.append(vitals["oxygen_saturation"])
+        self.sys.append(vitals["bp_systolic"])
+        self.dia.append(vitals["bp_diastolic"])
+        self.temp.append(vitals["temperature"])
+
+        ts = self.ts
+        n = len(ts)
+        t_now = ts[-1]
+        for key, seconds in _RATE_WINDOWS:
+            ref = self._ref_idx[key]
+            if evicting and ref > 0:
+                ref -= 1
+            # timestamps are monotonic, so the pointer only ever moves forward
+            while ref + 1 < n and t_now - ts[ref + 1] >= seconds:
+                ref += 1
+            self._ref_idx[key] = ref
+
+    def _rate_per_min(self, key: str) -> float:
+        # plain Python on purpose: with the _ref_idx pointers this is two deque
+        # reads and a divide, cheaper than boxing the deques into a Numba call
+        if len(self.ts) < 2:
             return 0.0
-        t_now, v_now = self.data[-1]
-        t_ref, v_ref = self.data[0]
-        for t_i, v_i in self.data:
-            if t_now - t_i >= seconds:
-                t_ref, v_ref = t_i, v_i
-                break
-        dt = max(1e-6, t_now - t_ref)
-        return (v_now[key] - v_ref[key]) / dt * 60.0
+        ref = self._ref_idx[key]
+        arr = self._series[key]
+        dt = max(1e-6, self.ts[-1] - self.ts[ref])
+        return (arr[-1] - arr[ref]) / dt * 60.0
 
     def rates_per_min(self) -> Dict[str, float]:
-        return {
-            "heart_rate": self._rate_per_min("heart_rate", 60.0),
-            "bp_systolic": self._rate_per_min("bp_systolic", 120.0),
-            "oxygen_saturation": self._rate_per_min("oxygen_saturation", 60.0),
-            "temperature": self._rate_per_min("temperature", 300.0),
-        }
-
-def classify_level(v: Dict[str, float], th: Thresholds, rates: Dict[str, float]) -> Tuple[str, List[str], float]:
-    reasons: List[str] = []
+        return {key: self._rate_per_min(key) for key, _ in _RATE_WINDOWS}
+
+_LEVELS = ("green", "yellow", "orange", "red")
+
+# reason bits set by _classify_core, in the order reasons are reported
+F_HR_RED, F_SPO2_RED, F_BP_RED, F_TEMP_RED = 1 << 0, 1 << 1, 1 << 2, 1 << 3
+F_HR_RISING, F_SPO2_DROPPING, F_SYS_RISING = 1 << 4, 1 << 5, 1 << 6
+F_HR_WARN, F_SPO2_WARN, F_BP_WARN, F_TEMP_WARN = 1 << 7, 1 << 8, 1 << 9, 1 << 10
+
+@njit(nb.types.Tuple((nb.int32, nb.float64, nb.uint32))(nb.float64[:], nb.float64[:]), cache=True)
+def _classify_core(x, th):
+    """
+    x  = [hr, spo2, sys, dia, temp, d_hr, d_spo2, d_sys]
+    th = Thresholds fields in declaration order.
+    Returns (level index into _LEVELS, score, reason flags).
+    """
+    hr, spo2, sys, dia, temp = x[0], x[1], x[2], x[3], x[4]
+    d_hr, d_spo2, d_sys = x[5], x[6], x[7]
     score = 0.0
+    flags = 0
     red_hits = 0
     warn_hits = 0
 
     # RED thresholds
-    if v["heart_rate"] >= th.hr_red:
-        red_hits += 1; score += 25
-        reasons.append(f"HR {v['heart_rate']:.0f} >= {th.hr_red:.0f}")
-    if v["oxygen_saturation"] <= th.spo2_red:
-        red_hits += 1; score += 30
-        reasons.append(f"SpO2 {v['oxygen_saturation']:.0f}% <= {th.spo2_red:.0f}%")
-    if v["bp_systolic"] >= th.sys_red or v["bp_diastolic"] >= th.dia_red:
-        red_hits += 1; score += 25
-        reasons.append(f"BP {v['bp_systolic']:.0f}/{v['bp_diastolic']:.0f} >= {th.sys_red:.0f}/{th.dia_red:.0f}")
-    if v["temperature"] >= th.temp_red_hi or v["temperature"] <= th.temp_red_lo:
-        red_hits += 1; score += 15
-        reasons.append(f"Temp {v['temperature']:.1f} outside [{th.temp_red_lo:.1f},{th.temp_red_hi:.1f}]")
+    if hr >= th[0]:
+        red_hits += 1; score += 25; flags |= F_HR_RED
+    if spo2 <= th[1]:
+        red_hits += 1; score += 30; flags |= F_SPO2_RED
+    if sys >= th[2] or dia >= th[3]:
+        red_hits += 1; score += 25; flags |= F_BP_RED
+    if temp >= th[4] or temp <= th[5]:
+        red_hits += 1; score += 15; flags |= F_TEMP_RED
 
     # Trend boosts
-    if rates["heart_rate"] >= 15:
-        score += 10; reasons.append(f"HR rising fast (+{rates['heart_rate']:.1f}/min)")
-    if rates["oxygen_saturation"] <= -2:
-        score += 15; reasons.append(f"SpO2 dropping (-{abs(rates['oxygen_saturation']):.1f}/min)")
-    if rates["bp_systolic"] >= 10:
-        score += 10; reasons.append(f"Systolic rising (+{rates['bp_systolic']:.1f}/min)")
+    if d_hr >= 15:
+        score += 10; flags |= F_HR_RISING
+    if d_spo2 <= -2:
+        score += 15; flags |= F_SPO2_DROPPING
+    if d_sys >= 10:
+        score += 10; flags |= F_SYS_RISING
 
     # Yellow thresholds
-    if v["heart_rate"] >= th.hr_yellow:
-        warn_hits += 1; score += 8
-        reasons.append(f"HR {v['heart_rate']:.0f} >= {th.hr_yellow:.0f} (warning)")
-    if v["oxygen_saturation"] <= th.spo2_yellow:
-        warn_hits += 1; score += 10
-        reasons.append(f"SpO2 {v['oxygen_saturation']:.0f}% <= {th.spo2_yellow:.0f}% (warning)")
-    if v["bp_systolic"] >= th.sys_yellow or v["bp_diastolic"] >= th.dia_yellow:
-        warn_hits += 1; score += 8
-        reasons.append(f"BP {v['bp_systolic']:.0f}/{v['bp_diastolic']:.0f} elevated (warning)")
-    if v["temperature"] >= th.temp_yellow_hi or v["temperature"] <= th.temp_yellow_lo:
-        warn_hits += 1; score += 6
-        reasons.append(f"Temp {v['temperature']:.1f} abnormal (warning)")
+    if hr >= th[6]:
+        warn_hits += 1; score += 8; flags |= F_HR_WARN
+    if spo2 <= th[7]:
+        warn_hits += 1; score += 10; flags |= F_SPO2_WARN
+    if sys >= th[8] or dia >= th[9]:
+        warn_hits += 1; score += 8; flags |= F_BP_WARN
+    if temp >= th[10] or temp <= th[11]:
+        warn_hits += 1; score += 6; flags |= F_TEMP_WARN
 
     score = max(0.0, min(100.0, score))
 
     if red_hits >= 1 and score >= 55:
-        return "red", reasons, score
-    if red_hits >= 1 or score >= 45 or warn_hits >= 2:
-        return "orange", reasons, score
-    if warn_hits >= 1 or score >= 20:
-        return "yellow", reasons, score
-    return "green", reasons, score
-
-def infer_outcomes(v: Dict[str, float], level: str, reasons: List[str]) -> List[Dict[str, Any]]:
-    outcomes: List[Dict[str, Any]] = []
+        level = 3
+    elif red_hits >= 1 or score >= 45 or warn_hits >= 2:
+        level = 2
+    elif warn_hits >= 1 or score >= 20:
+        level = 1
+    else:
+        level = 0
+    return level, score, flags
+
+# (flag, formatter(v, th, rates)) in the order reasons are reported
+REASON_FORMATTERS = (
+    (F_HR_RED,        lambda v, th, r: f"HR {v['heart_rate']:.0f} >= {th.hr_red:.0f}"),
+    (F_SPO2_RED,      lambda v, th, r: f"SpO2 {v['oxygen_saturation']:.0f}% <= {th.spo2_red:.0f}%"),
+    (F_BP_RED,        lambda v, th, r: f"BP {v['bp_systolic']:.0f}/{v['bp_diastolic']:.0f} >= {th.sys_red:.0f}/{th.dia_red:.0f}"),
+    (F_TEMP_RED,      lambda v, th, r: f"Temp {v['temperature']:.1f} outside [{th.temp_red_lo:.1f},{th.temp_red_hi:.1f}]"),
+    (F_HR_RISING,     lambda v, th, r: f"HR rising fast (+{r['heart_rate']:.1f}/min)"),
+    (F_SPO2_DROPPING, lambda v, th, r: f"SpO2 dropping (-{abs(r['oxygen_saturation']):.1f}/min)"),
+    (F_SYS_RISING,    lambda v, th, r: f"Systolic rising (+{r['bp_systolic']:.1f}/min)"),
+    (F_HR_WARN,       lambda v, th, r: f"HR {v['heart_rate']:.0f} >= {th.hr_yellow:.0f} (warning)"),
+    (F_SPO2_WARN,     lambda v, th, r: f"SpO2 {v['oxygen_saturation']:.0f}% <= {th.spo2_yellow:.0f}% (warning)"),
+    (F_BP_WARN,       lambda v, th, r: f"BP {v['bp_systolic']:.0f}/{v['bp_diastolic']:.0f} elevated (warning)"),
+    (F_TEMP_WARN,     lambda v, th, r: f"Temp {v['temperature']:.1f} abnormal (warning)"),
+)
+
+# packed kernel input per Thresholds; profile thresholds are prebuilt, custom ones cached on first use
+_THRESH_ARRAYS: Dict[Thresholds, np.ndarray] = {
+    th: np.array(astuple(th), dtype=np.float64) for th in _THRESHOLDS_BY_PROFILE.values()
+}
+
+def _thresholds_array(th: Thresholds) -> np.ndarray:
+    arr = _THRESH_ARRAYS.get(th)
+    if arr is None:
+        arr = _THRESH_ARRAYS[th] = np.array(astuple(th), dtype=np.float64)
+    return arr
 
-    if v["heart_rate"] >= 130 and (v["bp_systolic"] >= 170 or v["oxygen_saturation"] <= 92):
-        outcomes.append({
-            "name": "Acute cardiac event risk",
-            "probability": 0.75 if level == "red" else 0.55,
-            "because": ["High HR with high BP or low SpO2"] + reasons[:2],
-            "action": "Immediate clinician review; ECG + troponin; oxygen support if needed."
-        })
-
-    if v["bp_systolic"] >= 180 or v["bp_diastolic"] >= 120:
-        outcomes.append({
-            "name": "Stroke / hypertensive crisis risk",
-            "probability": 0.80 if level in ("orange", "red") else 0.60,
-            "because": ["Severely elevated blood pressure"] + reasons[:2],
-            "action": "Urgent BP management; neuro checks; emergency protocol if needed."
-        })
+def classify_level(v: Dict[str, float], th: Thresholds, rates: Dict[str, float]) -> Tuple[str, List[str], float]:
+    x = np.array([
+        v["heart_rate"], v["oxygen_saturation"], v["bp_systolic"], v["bp_diastolic"], v["temperature"],
+        rates["heart_rate"], rates["oxygen_saturation"], rates["bp_systolic"],
+    ], dtype=np.float64)
+    level, score, flags = _classify_core(x, _thresholds_array(th))
+
+    if not flags:   # common stable path: nothing to explain, no string formatting
+        return _LEVELS[level], [], score
+    reasons = [fmt(v, th, rates) for bit, fmt in REASON_FORMATTERS if flags & bit]
+    return _LEVELS[level], reasons, score
+
+# static part of each outcome rule, aligned with the predicates in infer_outcomes:
+# (name, levels that raise the probability, probability if so, probability otherwise, because, action)
+_OUTCOME_TEMPLATES = (
+    ("Acute cardiac event risk", ("red",), 0.75, 0.55,
+     "High HR with high BP or low SpO2",
+     "Immediate clinician review; ECG + troponin; oxygen support if needed."),
+    ("Stroke / hypertensive crisis risk", ("orange", "red"), 0.80, 0.60,
+     "Severely elevated blood pressure",
+     "Urgent BP management; neuro checks; emergency protocol if needed."),
+    ("Respiratory compromise risk", ("red",), 0.85, 0.65,
+     "Low oxygen saturation",
+     "Check airway; oxygen; evaluate pulmonary causes."),
+    ("Systemic infection / sepsis risk (screen)", ("orange", "red"), 0.60, 0.40,
+     "Fever + tachycardia pattern",
+     "Clinical assessment; labs; fluids per protocol if indicated."),
+)
 
-    if v["oxygen_saturation"] <= 90:
-        outcomes.append({
-            "name": "Respiratory compromise risk",
-            "probability": 0.85 if level == "red" else 0.65,
-            "because": ["Low oxygen saturation"] + reasons[:2],
-            "action": "Check airway; oxygen; evaluate pulmonary causes."
-        })
+def infer_outcomes(v: Dict[str, float], level: str, reasons: List[str]) -> List[Dict[str, Any]]:
+    hr, sys, dia = v["heart_rate"], v["bp_systolic"], v["bp_diastolic"]
+    spo2, temp = v["oxygen_saturation"], v["temperature"]
+    hits = (
+        hr >= 130 and (sys >= 170 or spo2 <= 92),
+        sys >= 180 or dia >= 120,
+        spo2 <= 90,
+        temp >= 38.5 and hr >= 120,
+    )
 
-    if v["temperature"] >= 38.5 and v["heart_rate"] >= 120:
-        outcomes.append({
-            "name": "Systemic infection / sepsis risk (screen)",
-            "probability": 0.60 if level in ("orange", "red") else 0.40,
-            "because": ["Fever + tachycardia pattern"] + reasons[:2],
-            "action": "Clinical assessment; labs; fluids per protocol if indicated."
-        })
+    outcomes: List[Dict[str, Any]] = []
+    if any(hits):
+        for hit, (name, hot_levels, p_hot, p_cold, because, action) in zip(hits, _OUTCOME_TEMPLATES):
+            if hit:
+                outcomes.append({
+                    "name": name,
+                    "probability": p_hot if level in hot_levels else p_cold,
+                    "because": [because] + reasons[:2],
+                    "action": action,
+                })
 
     if not outcomes and level in ("orange", "red"):
         outcomes.append({
@@ -1,55 +1,214 @@
-import random
-from typing import Dict
+from dataclasses import dataclass
+from typing import Dict, Sequence
+import threading
 
+import numpy as np
+from numba import njit, prange
 
-def _clamp(x, lo, hi):
-    return max(lo, min(hi, x))
 
+# starting (hr, sys, dia, spo2, temp) per profile; unknown profiles start as "normal"
+_PROFILE_BASE = {
+    "normal":       (78, 124, 80, 98, 36.7),
+    "athlete":      (62, 118, 74, 98, 36.6),
+    "hypertensive": (82, 148, 96, 97, 36.8),
+    "critical":     (98, 140, 92, 95, 37.4),
+}
+_PROFILE_IDS = {profile: i for i, profile in enumerate(_PROFILE_BASE)}
+_BASELINES = np.array(list(_PROFILE_BASE.values()), dtype=np.float64)   # (n_profiles, 5)
 
-def generate_vitals(profile: str, state: Dict) -> Dict[str, float]:
+
+# physiological clamp [lo, hi] for (hr, sys, dia, spo2, temp); a constant inside the Numba kernels
+_BOUNDS = np.array([
+    [40.0, 190.0],
+    [90.0, 220.0],
+    [50.0, 140.0],
+    [75.0, 100.0],
+    [34.0,  41.0],
+])
+
+
+def _profile_id(profile: str) -> int:
+    return _PROFILE_IDS.get(profile, _PROFILE_IDS["normal"])
+
+
+# uniforms consumed per patient per tick by _update_vitals_nb
+_N_DRAWS = 11
+
+# The three rare events (HR/BP surge, SpO2 drop, fever spike) are decided from
+# one uniform: its top 51 bits are split into three 17-bit fields, each
+# compared against round(p * 2**17) (p within 1e-5 of 0.02 / 0.02 / 0.01).
+_EVENT_BITS = 17
+_EVENT_MASK = (1 << _EVENT_BITS) - 1
+_EVENT_SCALE = float(1 << (3 * _EVENT_BITS))
+_T_SURGE = round(0.02 * (1 << _EVENT_BITS))
+_T_SPO2_DROP = round(0.02 * (1 << _EVENT_BITS))
+_T_FEVER = round(0.01 * (1 << _EVENT_BITS))
+
+_rng_local = threading.local()
+
+
+def _thread_rng() -> np.random.Generator:
+    """A PCG64 generator private to the calling thread."""
+    rng = getattr(_rng_local, "rng", None)
+    if rng is None:
+        rng = _rng_local.rng = np.random.default_rng()
+    return rng
+
+
+@njit(cache=True, fastmath=True, nogil=True)
+def _update_vitals_nb(x, u):
     """
-    Generates semi-realistic vitals with continuity using 'state'.
+    One tick for a single patient; x = [hr, sys, dia, spo2, temp], updated in place.
+    u holds _N_DRAWS uniforms in [0, 1) from the caller's generator.
     """
-    if not state:
-        if profile == "athlete":
-            state.update({"hr": 62, "sys": 118, "dia": 74, "spo2": 98, "temp": 36.6})
-        elif profile == "hypertensive":
-            state.update({"hr": 82, "sys": 148, "dia": 96, "spo2": 97, "temp": 36.8})
-        elif profile == "critical":
-            state.update({"hr": 98, "sys": 140, "dia": 92, "spo2": 95, "temp": 37.4})
-        else:
-            state.update({"hr": 78, "sys": 124, "dia": 80, "spo2": 98, "temp": 36.7})
-
     # random walk
-    state["hr"]   += random.uniform(-2.5, 2.5)
-    state["sys"]  += random.uniform(-3.0, 3.0)
-    state["dia"]  += random.uniform(-2.0, 2.0)
-    state["spo2"] += random.uniform(-0.6, 0.4)
-    state["temp"] += random.uniform(-0.05, 0.05)
+    x[0] += -2.5  + 5.0 * u[0]
+    x[1] += -3.0  + 6.0 * u[1]
+    x[2] += -2.0  + 4.0 * u[2]
+    x[3] += -0.6  + 1.0 * u[3]
+    x[4] += -0.05 + 0.1 * u[4]
 
-    # occasional deterioration
-    if random.random() < 0.02:
-        state["hr"]  += random.uniform(10, 25)
-        state["sys"] += random.uniform(15, 35)
-        state["dia"] += random.uniform(10, 20)
+    # occasional deterioration, all three decisions from the bits of u[5]
+    r = np.int64(u[5] * _EVENT_SCALE)
+    if (r & _EVENT_MASK) < _T_SURGE:
+        x[0] += 10 + 15 * u[6]
+        x[1] += 15 + 20 * u[7]
+        x[2] += 10 + 10 * u[8]
 
-    if random.random() < 0.02:
-        state["spo2"] -= random.uniform(2, 6)
+    if ((r >> _EVENT_BITS) & _EVENT_MASK) < _T_SPO2_DROP:
+        x[3] -= 2 + 4 * u[9]
 
-    if random.random() < 0.01:
-        state["temp"] += random.uniform(0.6, 1.2)
+    if (r >> (2 * _EVENT_BITS)) < _T_FEVER:
+        x[4] += 0.6 + 0.6 * u[10]
 
     # clamp
-    state["hr"]   = _clamp(state["hr"],   40,   190)
-    state["sys"]  = _clamp(state["sys"],  90,   220)
-    state["dia"]  = _clamp(state["dia"],  50,   140)
-    state["spo2"] = _clamp(state["spo2"], 75,   100)
-    state["temp"] = _clamp(state["temp"], 34.0, 41.0)
+    for j in range(5):
+        x[j] = min(max(x[j], _BOUNDS[j, 0]), _BOUNDS[j, 1])
+
+
+@njit(parallel=True, fastmath=True, cache=True)
+def _simulate_tick_nb(states, u):
+    for i in prange(states.shape[0]):
+        _update_vitals_nb(states[i], u[i])
+
+
+def simulate_tick(states: np.ndarray, rng: np.random.Generator | None = None) -> None:
+    """
+    One tick for many patients; `states` is a C-contiguous (N, 5) float64
+    array of per-patient [hr, sys, dia, spo2, temp] rows, updated in place.
+    All uniforms are drawn up front in one call, then the independent rows
+    are spread across Numba's worker threads.
+    """
+    if rng is None:
+        rng = _thread_rng()
+    _simulate_tick_nb(states, rng.random((states.shape[0], _N_DRAWS)))
+
+
+def initial_states(profiles: Sequence[str]) -> np.ndarray:
+    """(N, 5) starting rows for simulate_tick, one per profile."""
+    return _BASELINES[[_profile_id(p) for p in profiles]]
+
+
+class VitalState:
+    """
+    Per-patient simulator state: `arr` is the length-5 float64 row
+    [hr, sys, dia, spo2, temp] that _update_vitals_nb updates in place and
+    `rng` is the patient's PCG64 stream. Slots make both a fixed-offset load
+    instead of a dict probe; `state["hr"]` etc. still read the current value.
+    """
+    __slots__ = ("arr", "rng")
+
+    _INDEX = {"hr": 0, "sys": 1, "dia": 2, "spo2": 3, "temp": 4}
+
+    def __init__(self, profile: str = "normal", rng: np.random.Generator | None = None):
+        self.arr = _BASELINES[_profile_id(profile)].copy()
+        self.rng = rng if rng is not None else np.random.default_rng()
+
+    def __getitem__(self, key: str) -> float:
+        return float(self.arr[self._INDEX[key]])
 
+
+def _vital_state(profile: str, state: "VitalState | Dict") -> VitalState:
+    if isinstance(state, VitalState):
+        return state
+    # plain dicts from older callers carry a VitalState (and optionally a seeded "_rng")
+    vs = state.get("_vs")
+    if vs is None:
+        vs = state["_vs"] = VitalState(profile, state.get("_rng"))
+    return vs
+
+
+def _advance(profile: str, state: "VitalState | Dict") -> np.ndarray:
+    vs = _vital_state(profile, state)
+    _update_vitals_nb(vs.arr, vs.rng.random(_N_DRAWS))
+    return vs.arr
+
+
+def _rounded(x: np.ndarray) -> Dict[str, float]:
+    hr, sys, dia, spo2, temp = x.tolist()   # round() on numpy scalars is several times slower
+    return {
+        "heart_rate":        round(hr,   1),
+        "bp_systolic":       round(sys,  1),
+        "bp_diastolic":      round(dia,  1),
+        "oxygen_saturation": round(spo2, 1),
+        "temperature":       round(temp, 2),
+    }
+
+
+def snapshot(state: "VitalState | Dict") -> Dict[str, float]:
+    """Current vitals in `state`, rounded for display."""
+    return _rounded(state.arr if isinstance(state, VitalState) else state["_vs"].arr)
+
+
+def generate_vitals_raw(profile: str, state: "VitalState | Dict") -> Dict[str, float]:
+    """
+    Like generate_vitals() but unrounded, for callers that classify/store
+    the values and round only when displaying them.
+    """
+    hr, sys, dia, spo2, temp = _advance(profile, state).tolist()
     return {
-        "heart_rate":        float(round(state["hr"],   1)),
-        "bp_systolic":       float(round(state["sys"],  1)),
-        "bp_diastolic":      float(round(state["dia"],  1)),
-        "oxygen_saturation": float(round(state["spo2"], 1)),
-        "temperature":       float(round(state["temp"], 2)),
+        "heart_rate":        hr,
+        "bp_systolic":       sys,
+        "bp_diastolic":      dia,
+        "oxygen_saturation": spo2,
+        "temperature":       temp,
     }
+
+
+def generate_vitals(profile: str, state: "VitalState | Dict") -> Dict[str, float]:
+    """
+    Generates semi-realistic vitals with continuity using 'state'.
+    """
+    return _rounded(_advance(profile, state))
+
+
+@dataclass
+class VitalsBatch:
+    """
+    Simulator state for N patients: one C-contiguous (N, 5) float64 array of
+    [hr, sys, dia, spo2, temp] rows, the layout simulate_tick() advances.
+    hr/sys/dia/spo2/temp are writable column views for per-vital access.
+    """
+    states: np.ndarray
+
+    @classmethod
+    def from_profiles(cls, profiles: Sequence[str]) -> "VitalsBatch":
+        return cls(initial_states(profiles))
+
+    hr   = property(lambda self: self.states[:, 0])
+    sys  = property(lambda self: self.states[:, 1])
+    dia  = property(lambda self: self.states[:, 2])
+    spo2 = property(lambda self: self.states[:, 3])
+    temp = property(lambda self: self.states[:, 4])
+
+    def __len__(self) -> int:
+        return self.states.shape[0]
+
+    def vitals(self, i: int) -> Dict[str, float]:
+        """Row i in the same shape as generate_vitals() returns."""
+        return _rounded(self.states[i])
+
+
+def advance_batch(batch: VitalsBatch, rng: np.random.Generator | None = None) -> None:
+    """Advances every patient in `batch` by one tick, in place (same kernel as generate_vitals)."""
+    simulate_tick(batch.states, rng)
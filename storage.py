@@ -1,15 +1,27 @@
-from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, Text
-from sqlalchemy.orm import declarative_base, sessionmaker
-from sqlalchemy.sql import func
-import json
+from sqlalchemy import bindparam, create_engine, event, func, inspect, select, Engine, Column, BigInteger, Index, Integer, String, Float, Text
+from sqlalchemy.orm import declarative_base, scoped_session, sessionmaker
+from datetime import datetime, timezone
+from typing import Dict, List, Sequence
+import atexit
+import logging
+import mmap
+import struct
+import threading
+import time
+
+import numpy as np
+import orjson
+
+log = logging.getLogger(__name__)
 
 Base = declarative_base()
 
 class VitalRow(Base):
     __tablename__ = "vitals"
+    __table_args__ = (Index("ix_vitals_patient_ts", "patient_id", "ts"),)
     id = Column(Integer, primary_key=True)
-    patient_id = Column(String, index=True, nullable=False)
-    ts = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+    patient_id = Column(String, nullable=False)
+    ts = Column(BigInteger, nullable=False)   # epoch nanoseconds (UTC), set by the writer
     heart_rate = Column(Float, nullable=False)
     bp_systolic = Column(Float, nullable=False)
     bp_diastolic = Column(Float, nullable=False)
@@ -18,52 +30,309 @@ class VitalRow(Base):
 
 class EventRow(Base):
     __tablename__ = "events"
+    __table_args__ = (Index("ix_events_patient_ts", "patient_id", "ts"),)
     id = Column(Integer, primary_key=True)
-    patient_id = Column(String, index=True, nullable=False)
-    ts = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+    patient_id = Column(String, nullable=False)
+    ts = Column(BigInteger, nullable=False)   # epoch nanoseconds (UTC), set by the writer
     level = Column(String, nullable=False)
     title = Column(String, nullable=False)
     message = Column(Text, nullable=False)
     payload_json = Column(Text, nullable=True)
 
-def init_db(db_url: str = "sqlite:///risk_trajectory.db"):
+# Inserts, built once: buffered rows are write-only, so they never go through the ORM.
+# Vitals are buffered as positional tuples in VITALS_COLUMNS order and go straight to
+# the driver's executemany; events are rare and stay as Core dicts.
+VITALS_COLUMNS = ("patient_id", "ts", "heart_rate", "bp_systolic", "bp_diastolic", "oxygen_saturation", "temperature")
+VITALS_INSERT_SQL = (
+    f"INSERT INTO {VitalRow.__tablename__} ({', '.join(VITALS_COLUMNS)}) "
+    f"VALUES ({', '.join('?' * len(VITALS_COLUMNS))})"
+)
+EVENTS_INSERT = EventRow.__table__.insert()
+
+_ENGINES: Dict[str, Engine] = {}
+
+def _check_ts_columns(engine: Engine):
+    """
+    create_all leaves existing tables alone, and SQLite happily stores epoch-ns
+    ints in a baseline DATETIME `ts` column; reads then mix strings and ints.
+    Refuse such a database instead of corrupting the timeline.
+    """
+    insp = inspect(engine)
+    for table in (VitalRow.__table__, EventRow.__table__):
+        ts_type = next(c["type"] for c in insp.get_columns(table.name) if c["name"] == "ts")
+        if not isinstance(ts_type, Integer):
+            raise RuntimeError(
+                f"{engine.url}: table '{table.name}' has a legacy {ts_type} 'ts' column; timestamps are "
+                "now epoch-nanosecond integers. Move the old database aside (or delete it) and restart."
+            )
+
+def get_engine(db_url: str = "sqlite:///risk_trajectory.db") -> Engine:
+    """One engine (and connection pool) per database URL for the whole process."""
+    engine = _ENGINES.get(db_url)
+    if engine is not None:
+        return engine
+
     engine = create_engine(db_url, connect_args={"check_same_thread": False})
+
+    @event.listens_for(engine, "connect")
+    def _sqlite_pragmas(dbapi_conn, _record):
+        # WAL + NORMAL: commits no longer fsync the main DB file, readers don't block the writer
+        cur = dbapi_conn.cursor()
+        cur.execute("PRAGMA journal_mode=WAL")
+        cur.execute("PRAGMA synchronous=NORMAL")
+        cur.execute("PRAGMA temp_store=MEMORY")
+        cur.execute("PRAGMA mmap_size=268435456")
+        cur.execute("PRAGMA cache_size=-65536")   # 64 MiB page cache
+        cur.close()
+
     Base.metadata.create_all(engine)
-    return sessionmaker(bind=engine, autoflush=False, autocommit=False)
+    _check_ts_columns(engine)
+    # create_all skips indexes on tables that already exist
+    for table in Base.metadata.sorted_tables:
+        for ix in table.indexes:
+            ix.create(engine, checkfirst=True)
+    # refresh planner statistics; analysis_limit samples ~1000 rows per index, so
+    # startup cost stays flat as the tables grow (PRAGMA optimize on a fresh
+    # connection has no usage history and analyzes nothing)
+    with engine.begin() as conn:
+        conn.exec_driver_sql("PRAGMA analysis_limit=1000")
+        conn.exec_driver_sql("ANALYZE")
+    return _ENGINES.setdefault(db_url, engine)
 
-def save_vital(Session, patient_id: str, v: dict):
-    with Session() as s:
-        row = VitalRow(patient_id=patient_id, **v)
-        s.add(row)
-        s.commit()
+def init_db(db_url: str = "sqlite:///risk_trajectory.db"):
+    # thread-local Session registry: ticker threads and script threads each reuse their own Session
+    return scoped_session(sessionmaker(bind=get_engine(db_url), autoflush=False, autocommit=False))
 
-def save_event(Session, patient_id: str, level: str, title: str, message: str, payload: dict):
-    with Session() as s:
-        row = EventRow(
-            patient_id=patient_id,
-            level=level,
-            title=title,
-            message=message,
-            payload_json=json.dumps(payload, ensure_ascii=False),
-        )
-        s.add(row)
-        s.commit()
-
-def load_events(Session, patient_id: str, limit: int = 50):
+class VitalsRingBuffer:
+    """
+    Fixed-width vitals records in a memory-mapped ring: `<Q5dQ` = patient id,
+    [hr, sys, dia, spo2, temp], epoch-ns ts. Producers pack straight into the
+    map (no per-row objects); a single consumer reads a slab and only
+    consume()s it once it is committed, so a failed write leaves the records
+    in place. Patient ids are interned to small integers to keep records
+    fixed-width. The map is anonymous: the ring is an in-process buffer, not a
+    journal, and anything not yet written is lost if the process dies.
+    """
+    RECORD = struct.Struct("<Q5dQ")
+
+    def __init__(self, capacity: int = 65536):
+        self.capacity = capacity
+        self._mm = mmap.mmap(-1, capacity * self.RECORD.size)
+        self._view = memoryview(self._mm)
+        self._ids: Dict[str, int] = {}
+        self._names: List[str] = []
+        self._head = 0   # total records pushed
+        self._tail = 0   # total records consumed
+        self._cond = threading.Condition()
+
+    def __len__(self) -> int:
+        return self._head - self._tail
+
+    def _pid(self, patient_id: str) -> int:
+        pid = self._ids.get(patient_id)
+        if pid is None:
+            pid = self._ids[patient_id] = len(self._names)
+            self._names.append(patient_id)
+        return pid
+
+    def push(self, patient_id: str, ts: int, hr: float, sys: float, dia: float, spo2: float, temp: float,
+             timeout: float | None = None) -> bool:
+        """
+        Appends one record. When the ring is full, waits up to `timeout`
+        seconds (forever if None) for the consumer; returns False, dropping
+        the record, if there is still no room.
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._head - self._tail < self.capacity, timeout):
+                return False
+            self.RECORD.pack_into(self._mm, (self._head % self.capacity) * self.RECORD.size,
+                                  self._pid(patient_id), hr, sys, dia, spo2, temp, ts)
+            self._head += 1
+            return True
+
+    def push_many(self, patient_ids: Sequence[str], ts: int, states: np.ndarray,
+                  timeout: float | None = None) -> int:
+        """One tick of (N, 5) [hr, sys, dia, spo2, temp] rows, all stamped `ts`; returns how many fit."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        pushed = 0
+        for patient_id, (hr, sys, dia, spo2, temp) in zip(patient_ids, states.tolist()):
+            left = None if deadline is None else max(0.0, deadline - time.monotonic())
+            if not self.push(patient_id, ts, hr, sys, dia, spo2, temp, left):
+                break
+            pushed += 1
+        return pushed
+
+    def read(self, n: int) -> List[tuple]:
+        """Up to `n` of the oldest records as VITALS_COLUMNS tuples, without consuming them."""
+        with self._cond:
+            first, n = self._tail, min(n, self._head - self._tail)
+        names, size = self._names, self.RECORD.size
+        rows = []
+        while n:
+            i = first % self.capacity
+            k = min(n, self.capacity - i)   # at most two contiguous runs when wrapping
+            rows += [(names[pid], ts, hr, sys, dia, spo2, temp)
+                     for pid, hr, sys, dia, spo2, temp, ts in self.RECORD.iter_unpack(self._view[i * size:(i + k) * size])]
+            first += k
+            n -= k
+        return rows
+
+    def consume(self, n: int):
+        with self._cond:
+            self._tail += n
+            self._cond.notify_all()
+
+
+class WriteBuffer:
+    """
+    Vitals go into a VitalsRingBuffer and events into a list; a background
+    thread writes both in a single transaction once `max_rows` vitals are
+    pending or `max_age_s` has passed, so tickers never wait on SQLite.
+    A failed write is logged and retried with backoff. If the ring fills up
+    meanwhile, add_vital waits at most `push_timeout_s` and then drops the
+    row (counted in `dropped`) rather than stalling the ticker.
+    """
+    SLAB = 1000          # vitals rows per executemany
+    MAX_BACKOFF_S = 30.0
+
+    def __init__(self, Session, max_rows: int = 500, max_age_s: float = 5.0,
+                 ring_capacity: int = 65536, push_timeout_s: float = 0.5):
+        self.Session = Session
+        self.max_rows = max_rows
+        self.max_age_s = max_age_s
+        self.push_timeout_s = push_timeout_s
+        self.ring = VitalsRingBuffer(ring_capacity)
+        self.events_buf: list = []
+        self.dropped = 0
+        self._lock = threading.Lock()         # guards events_buf only; never held across DB I/O
+        self._flush_lock = threading.Lock()   # serializes flushes (drainer, app, atexit)
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._drainer = threading.Thread(target=self._drain_loop, name="vitals-drain", daemon=True)
+        self._drainer.start()
+        atexit.register(self.flush)   # don't lose the tail of the buffer on shutdown
+
+    def _pushed(self, n_pushed: int, n_rows: int):
+        if n_pushed < n_rows:
+            with self._lock:   # tickers share one writer
+                self.dropped += n_rows - n_pushed
+                dropped = self.dropped
+            log.warning("vitals ring full; dropped %d row(s) (%d total)", n_rows - n_pushed, dropped)
+        if len(self.ring) >= self.max_rows:
+            self._wake.set()
+
+    def add_vital(self, patient_id: str, v: dict):
+        # ts is taken here, not at flush, so buffered rows keep their tick time
+        ok = self.ring.push(patient_id, time.time_ns(), v["heart_rate"], v["bp_systolic"], v["bp_diastolic"],
+                            v["oxygen_saturation"], v["temperature"], timeout=self.push_timeout_s)
+        self._pushed(int(ok), 1)
+
+    def add_vitals_batch(self, patient_ids: Sequence[str], states: np.ndarray):
+        """Buffers one tick of simulator.simulate_tick() state: (N, 5) rows of [hr, sys, dia, spo2, temp]."""
+        n = self.ring.push_many(patient_ids, time.time_ns(), states, timeout=self.push_timeout_s)
+        self._pushed(n, len(states))
+
+    def add_event(self, patient_id: str, level: str, title: str, message: str, payload: dict):
+        row = {
+            "patient_id": patient_id,
+            "ts": time.time_ns(),
+            "level": level,
+            "title": title,
+            "message": message,
+            "payload_json": orjson.dumps(payload).decode(),   # encoded outside the lock
+        }
+        with self._lock:
+            self.events_buf.append(row)
+
+    def request_flush(self):
+        """Asks the drainer to write now instead of at the next max_age_s tick; never blocks."""
+        self._wake.set()
+
+    def _drain_loop(self):
+        backoff = 0.5
+        while not self._stop.is_set():
+            self._wake.wait(self.max_age_s)
+            self._wake.clear()
+            if self._stop.is_set():
+                break   # close() does the final flush
+            try:
+                self.flush()
+                backoff = 0.5
+            except Exception:   # e.g. "database is locked": keep the rows and try again later
+                log.exception("flushing %d vitals / %d events failed; retrying in %.1fs",
+                              len(self.ring), len(self.events_buf), backoff)
+                self._stop.wait(backoff)
+                backoff = min(2 * backoff, self.MAX_BACKOFF_S)
+
+    def close(self):
+        """Stops the drainer and writes whatever is still buffered."""
+        self._stop.set()
+        self._wake.set()
+        self._drainer.join()
+        atexit.unregister(self.flush)
+        self.flush()
+
+    def flush(self):
+        with self._flush_lock:
+            with self._lock:
+                events, self.events_buf = self.events_buf, []
+            rows = self.ring.read(len(self.ring))
+            if not rows and not events:
+                return
+            try:
+                with self.Session() as s, s.begin():
+                    conn = s.connection()
+                    for i in range(0, len(rows), self.SLAB):
+                        conn.exec_driver_sql(VITALS_INSERT_SQL, rows[i:i + self.SLAB])
+                    if events:
+                        s.execute(EVENTS_INSERT, events)
+            except BaseException:
+                with self._lock:
+                    self.events_buf[:0] = events   # back in front of anything added meanwhile
+                raise
+            self.ring.consume(len(rows))
+
+_EVENTS = EventRow.__table__.c
+
+_LOAD_EVENTS_STMT = (
+    select(_EVENTS.ts, _EVENTS.level, _EVENTS.title, _EVENTS.message)
+    .where(_EVENTS.patient_id == bindparam("pid"))
+    .order_by(_EVENTS.ts.desc())
+    .limit(bindparam("lim"))
+    .execution_options(yield_per=100)
+)
+# index-only probe on ix_events_patient_ts: has anything been written since the cached page?
+_LATEST_EVENT_TS_STMT = select(func.max(_EVENTS.ts)).where(_EVENTS.patient_id == bindparam("pid"))
+
+# (Session, patient_id, limit) -> (latest ts when loaded, page), oldest entry evicted first
+_EVENTS_CACHE: Dict[tuple, tuple] = {}
+_EVENTS_CACHE_MAX = 256
+_EVENTS_CACHE_LOCK = threading.Lock()
+
+def load_events(Session, patient_id: str, limit: int = 50) -> Dict[str, list]:
+    """
+    Latest events for a patient, newest first, as column lists (ts, level, title, message).
+    Repeated polls with no new events return the cached page; treat it as read-only.
+    The cache is validated by the patient's MAX(ts) alone, which holds because
+    events are append-only and one ticker stamps each patient's events in
+    strictly increasing time_ns(); deleting rows behind its back is not detected.
+    """
+    key = (Session, patient_id, limit)
     with Session() as s:
-        q = (
-            s.query(EventRow)
-             .filter(EventRow.patient_id == patient_id)
-             .order_by(EventRow.ts.desc())
-             .limit(limit)
-        )
-        rows = q.all()
-        out = []
-        for r in rows:
-            out.append({
-                "ts": r.ts.isoformat() if r.ts else "",
-                "level": r.level,
-                "title": r.title,
-                "message": r.message,
-            })
-        return out
+        latest = s.execute(_LATEST_EVENT_TS_STMT, {"pid": patient_id}).scalar()
+        cached = _EVENTS_CACHE.get(key)
+        if cached is not None and cached[0] == latest:
+            return cached[1]
+
+        out: Dict[str, list] = {"ts": [], "level": [], "title": [], "message": []}
+        for ts, level, title, message in s.execute(_LOAD_EVENTS_STMT, {"pid": patient_id, "lim": limit}):
+            out["ts"].append(datetime.fromtimestamp(ts / 1e9, tz=timezone.utc).isoformat())
+            out["level"].append(level)
+            out["title"].append(title)
+            out["message"].append(message)
+    with _EVENTS_CACHE_LOCK:
+        _EVENTS_CACHE.pop(key, None)
+        while len(_EVENTS_CACHE) >= _EVENTS_CACHE_MAX:
+            del _EVENTS_CACHE[next(iter(_EVENTS_CACHE))]
+        _EVENTS_CACHE[key] = (latest, out)
+    return out
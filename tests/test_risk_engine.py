@@ -0,0 +1,170 @@
+import numpy as np
+import pytest
+
+from risk_engine import _RATE_WINDOWS, _THRESHOLDS_BY_PROFILE, RollingWindow, Thresholds, classify_level, infer_outcomes
+
+
+def _reference_classify(v, th: Thresholds, rates):
+    """classify_level as it was before the Numba kernel, kept as the oracle."""
+    reasons = []
+    score = 0.0
+    red_hits = 0
+    warn_hits = 0
+
+    if v["heart_rate"] >= th.hr_red:
+        red_hits += 1; score += 25
+        reasons.append(f"HR {v['heart_rate']:.0f} >= {th.hr_red:.0f}")
+    if v["oxygen_saturation"] <= th.spo2_red:
+        red_hits += 1; score += 30
+        reasons.append(f"SpO2 {v['oxygen_saturation']:.0f}% <= {th.spo2_red:.0f}%")
+    if v["bp_systolic"] >= th.sys_red or v["bp_diastolic"] >= th.dia_red:
+        red_hits += 1; score += 25
+        reasons.append(f"BP {v['bp_systolic']:.0f}/{v['bp_diastolic']:.0f} >= {th.sys_red:.0f}/{th.dia_red:.0f}")
+    if v["temperature"] >= th.temp_red_hi or v["temperature"] <= th.temp_red_lo:
+        red_hits += 1; score += 15
+        reasons.append(f"Temp {v['temperature']:.1f} outside [{th.temp_red_lo:.1f},{th.temp_red_hi:.1f}]")
+
+    if rates["heart_rate"] >= 15:
+        score += 10; reasons.append(f"HR rising fast (+{rates['heart_rate']:.1f}/min)")
+    if rates["oxygen_saturation"] <= -2:
+        score += 15; reasons.append(f"SpO2 dropping (-{abs(rates['oxygen_saturation']):.1f}/min)")
+    if rates["bp_systolic"] >= 10:
+        score += 10; reasons.append(f"Systolic rising (+{rates['bp_systolic']:.1f}/min)")
+
+    if v["heart_rate"] >= th.hr_yellow:
+        warn_hits += 1; score += 8
+        reasons.append(f"HR {v['heart_rate']:.0f} >= {th.hr_yellow:.0f} (warning)")
+    if v["oxygen_saturation"] <= th.spo2_yellow:
+        warn_hits += 1; score += 10
+        reasons.append(f"SpO2 {v['oxygen_saturation']:.0f}% <= {th.spo2_yellow:.0f}% (warning)")
+    if v["bp_systolic"] >= th.sys_yellow or v["bp_diastolic"] >= th.dia_yellow:
+        warn_hits += 1; score += 8
+        reasons.append(f"BP {v['bp_systolic']:.0f}/{v['bp_diastolic']:.0f} elevated (warning)")
+    if v["temperature"] >= th.temp_yellow_hi or v["temperature"] <= th.temp_yellow_lo:
+        warn_hits += 1; score += 6
+        reasons.append(f"Temp {v['temperature']:.1f} abnormal (warning)")
+
+    score = max(0.0, min(100.0, score))
+
+    if red_hits >= 1 and score >= 55:
+        return "red", reasons, score
+    if red_hits >= 1 or score >= 45 or warn_hits >= 2:
+        return "orange", reasons, score
+    if warn_hits >= 1 or score >= 20:
+        return "yellow", reasons, score
+    return "green", reasons, score
+
+
+def _random_inputs(n: int, seed: int = 0):
+    """Vitals and rates spread across every threshold, plus exact threshold hits."""
+    rng = np.random.default_rng(seed)
+    cols = rng.uniform(
+        low=(40, 75, 90, 50, 34, -30, -6, -25),
+        high=(190, 100, 220, 140, 41, 30, 6, 25),
+        size=(n, 8),
+    )
+    # snap some values to integers so the >= / <= boundaries are exercised
+    snap = rng.random(cols.shape) < 0.2
+    cols[snap] = np.round(cols[snap])
+    for hr, spo2, sys, dia, temp, d_hr, d_spo2, d_sys in cols.tolist():
+        v = {"heart_rate": hr, "oxygen_saturation": spo2, "bp_systolic": sys,
+             "bp_diastolic": dia, "temperature": temp}
+        rates = {"heart_rate": d_hr, "oxygen_saturation": d_spo2, "bp_systolic": d_sys,
+                 "temperature": 0.0}
+        yield v, rates
+
+
+@pytest.mark.parametrize("seed, profile", list(enumerate(sorted(_THRESHOLDS_BY_PROFILE))))
+def test_classify_level_matches_reference(seed, profile):
+    th = _THRESHOLDS_BY_PROFILE[profile]
+    for v, rates in _random_inputs(5000, seed=seed):
+        assert classify_level(v, th, rates) == _reference_classify(v, th, rates)
+
+
+def test_classify_level_custom_thresholds():
+    th = Thresholds(
+        hr_red=120, spo2_red=93, sys_red=160, dia_red=100, temp_red_hi=38.5, temp_red_lo=35.5,
+        hr_yellow=100, spo2_yellow=96, sys_yellow=140, dia_yellow=90, temp_yellow_hi=37.8, temp_yellow_lo=36.2,
+    )
+    for v, rates in _random_inputs(2000, seed=1):
+        assert classify_level(v, th, rates) == _reference_classify(v, th, rates)
+
+
+def _reference_rates(samples, maxlen):
+    """Brute force: rate against the newest sample at least `seconds` old, else the oldest kept."""
+    kept = samples[-maxlen:]
+    t_now, v_now = kept[-1]
+    out = {}
+    for key, seconds in _RATE_WINDOWS:
+        if len(kept) < 2:
+            out[key] = 0.0
+            continue
+        old = [(t, v) for t, v in kept if t_now - t >= seconds]
+        t_ref, v_ref = old[-1] if old else kept[0]
+        out[key] = (v_now[key] - v_ref[key]) / max(1e-6, t_now - t_ref) * 60.0
+    return out
+
+
+def test_rolling_window_reference_sample():
+    rng = np.random.default_rng(7)
+    maxlen = 120
+    w = RollingWindow(maxlen=maxlen)
+    samples = []
+    t = 1000.0
+    for _ in range(600):   # well past maxlen, so eviction shifts the pointers
+        t += rng.uniform(0.2, 4.0)
+        v = {"heart_rate": rng.uniform(50, 150), "oxygen_saturation": rng.uniform(85, 100),
+             "bp_systolic": rng.uniform(100, 180), "bp_diastolic": rng.uniform(60, 110),
+             "temperature": rng.uniform(35, 40)}
+        w.push(v, t_epoch=t)
+        samples.append((t, v))
+        assert w.rates_per_min() == pytest.approx(_reference_rates(samples, maxlen))
+
+
+def _reference_outcomes(v, level, reasons):
+    """infer_outcomes as it was before the rules were table-driven."""
+    outcomes = []
+    if v["heart_rate"] >= 130 and (v["bp_systolic"] >= 170 or v["oxygen_saturation"] <= 92):
+        outcomes.append({
+            "name": "Acute cardiac event risk",
+            "probability": 0.75 if level == "red" else 0.55,
+            "because": ["High HR with high BP or low SpO2"] + reasons[:2],
+            "action": "Immediate clinician review; ECG + troponin; oxygen support if needed.",
+        })
+    if v["bp_systolic"] >= 180 or v["bp_diastolic"] >= 120:
+        outcomes.append({
+            "name": "Stroke / hypertensive crisis risk",
+            "probability": 0.80 if level in ("orange", "red") else 0.60,
+            "because": ["Severely elevated blood pressure"] + reasons[:2],
+            "action": "Urgent BP management; neuro checks; emergency protocol if needed.",
+        })
+    if v["oxygen_saturation"] <= 90:
+        outcomes.append({
+            "name": "Respiratory compromise risk",
+            "probability": 0.85 if level == "red" else 0.65,
+            "because": ["Low oxygen saturation"] + reasons[:2],
+            "action": "Check airway; oxygen; evaluate pulmonary causes.",
+        })
+    if v["temperature"] >= 38.5 and v["heart_rate"] >= 120:
+        outcomes.append({
+            "name": "Systemic infection / sepsis risk (screen)",
+            "probability": 0.60 if level in ("orange", "red") else 0.40,
+            "because": ["Fever + tachycardia pattern"] + reasons[:2],
+            "action": "Clinical assessment; labs; fluids per protocol if indicated.",
+        })
+    if not outcomes and level in ("orange", "red"):
+        outcomes.append({
+            "name": "Undifferentiated deterioration risk",
+            "probability": 0.50,
+            "because": reasons[:3],
+            "action": "Repeat vitals; verify sensors; clinician evaluation.",
+        })
+    return outcomes
+
+
+@pytest.mark.parametrize("level", ["green", "yellow", "orange", "red"])
+def test_infer_outcomes_matches_reference(level):
+    th = _THRESHOLDS_BY_PROFILE["normal"]
+    for v, rates in _random_inputs(5000, seed=10):
+        _, reasons, _ = classify_level(v, th, rates)
+        assert infer_outcomes(v, level, reasons) == _reference_outcomes(v, level, reasons)
@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+import simulator
+from simulator import (_EVENT_BITS, _EVENT_MASK, _EVENT_SCALE, _N_DRAWS, _T_FEVER, _T_SPO2_DROP, _T_SURGE,
+                       _update_vitals_nb)
+
+
+def _event_fields(u: np.ndarray):
+    r = (u * _EVENT_SCALE).astype(np.int64)
+    return (
+        (r & _EVENT_MASK) < _T_SURGE,
+        ((r >> _EVENT_BITS) & _EVENT_MASK) < _T_SPO2_DROP,
+        (r >> (2 * _EVENT_BITS)) < _T_FEVER,
+    )
+
+
+def test_event_thresholds_round_to_requested_probabilities():
+    for t, p in ((_T_SURGE, 0.02), (_T_SPO2_DROP, 0.02), (_T_FEVER, 0.01)):
+        assert abs(t / (1 << _EVENT_BITS) - p) < 1e-5
+
+
+def test_event_fields_rates_and_independence():
+    n = 5_000_000
+    surge, drop, fever = _event_fields(np.random.default_rng(0).random(n))
+    tol = lambda p: 5 * np.sqrt(p * (1 - p) / n)   # 5 sigma
+    for hits, p in ((surge, 0.02), (drop, 0.02), (fever, 0.01)):
+        assert abs(hits.mean() - p) < tol(p)
+    for a, b, p in ((surge, drop, 0.02 * 0.02), (surge, fever, 0.02 * 0.01), (drop, fever, 0.02 * 0.01)):
+        assert abs((a & b).mean() - p) < tol(p)
+
+
+def _u_with_events(surge: bool, drop: bool, fever: bool) -> np.ndarray:
+    """Uniforms that leave the random walk at its midpoint and fire only the chosen events."""
+    f0 = 0 if surge else _EVENT_MASK
+    f1 = 0 if drop else _EVENT_MASK
+    f2 = 0 if fever else _EVENT_MASK
+    u = np.full(_N_DRAWS, 0.5)
+    u[5] = ((f2 << (2 * _EVENT_BITS)) | (f1 << _EVENT_BITS) | f0) / _EVENT_SCALE
+    return u
+
+
+@pytest.mark.parametrize("surge, drop, fever", [
+    (False, False, False), (True, False, False), (False, True, False), (False, False, True), (True, True, True),
+])
+def test_kernel_applies_selected_events(surge, drop, fever):
+    x0 = np.array([80.0, 120.0, 80.0, 97.0, 36.7])
+    x = x0.copy()
+    _update_vitals_nb(x, _u_with_events(surge, drop, fever))
+    # walk at u = 0.5: spo2 drifts -0.1, the rest stay put
+    expected = x0 + [0.0, 0.0, 0.0, -0.1, 0.0]
+    if surge:
+        expected[:3] += [10 + 15 * 0.5, 15 + 20 * 0.5, 10 + 10 * 0.5]
+    if drop:
+        expected[3] -= 2 + 4 * 0.5
+    if fever:
+        expected[4] += 0.6 + 0.6 * 0.5
+    np.testing.assert_allclose(x, expected)
+
+
+def test_batch_and_scalar_paths_share_the_kernel():
+    profiles = ["normal", "athlete", "hypertensive", "critical"] * 8
+    batch = simulator.VitalsBatch.from_profiles(profiles)
+    rows = simulator.initial_states(profiles)
+    rng_a, rng_b = np.random.default_rng(3), np.random.default_rng(3)
+    for _ in range(50):
+        simulator.advance_batch(batch, rng_a)
+        for x, u in zip(rows, rng_b.random((len(profiles), _N_DRAWS))):
+            _update_vitals_nb(x, u)
+    np.testing.assert_allclose(batch.states, rows)
@@ -0,0 +1,192 @@
+import sqlite3
+import time
+
+import numpy as np
+import pytest
+from sqlalchemy import event, func, select
+
+import storage
+from storage import get_engine, load_events
+
+
+def test_get_engine_rejects_legacy_datetime_ts(tmp_path):
+    path = tmp_path / "legacy.db"
+    with sqlite3.connect(path) as conn:   # the baseline schema, before ts became epoch ns
+        conn.execute("CREATE TABLE vitals (id INTEGER PRIMARY KEY, patient_id VARCHAR NOT NULL, ts DATETIME NOT NULL,"
+                     " heart_rate FLOAT NOT NULL, bp_systolic FLOAT NOT NULL, bp_diastolic FLOAT NOT NULL,"
+                     " oxygen_saturation FLOAT NOT NULL, temperature FLOAT NOT NULL)")
+        conn.execute("INSERT INTO vitals VALUES (1, 'P001', '2024-01-01 00:00:00', 80, 120, 80, 98, 36.7)")
+    with pytest.raises(RuntimeError, match="legacy"):
+        get_engine(f"sqlite:///{path}")
+
+
+def test_get_engine_reopens_current_schema(tmp_path):
+    url = f"sqlite:///{tmp_path / 'new.db'}"
+    get_engine(url)
+    storage._ENGINES.pop(url).dispose()
+    get_engine(url)   # a fresh engine inspects the tables the first call created
+
+
+@pytest.fixture
+def make_writer():
+    """WriteBuffer factory whose drainers are stopped (and buffers flushed) at teardown."""
+    writers = []
+
+    def make(Session, **kw):
+        writers.append(storage.WriteBuffer(Session, **kw))
+        return writers[-1]
+
+    yield make
+    for w in writers:
+        w.close()
+
+
+VITALS = {"heart_rate": 80.0, "bp_systolic": 120.0, "bp_diastolic": 80.0, "oxygen_saturation": 98.0, "temperature": 36.7}
+
+
+def test_ring_push_times_out_when_full():
+    ring = storage.VitalsRingBuffer(capacity=2)
+    assert ring.push("P1", 1, 1, 2, 3, 4, 5, timeout=0)
+    assert ring.push("P1", 2, 1, 2, 3, 4, 5, timeout=0)
+    assert not ring.push("P1", 3, 1, 2, 3, 4, 5, timeout=0.01)
+    ring.consume(1)
+    assert ring.push("P2", 4, 1, 2, 3, 4, 5, timeout=0)
+    assert [(pid, ts) for pid, ts, *_ in ring.read(10)] == [("P1", 2), ("P2", 4)]
+
+
+class _FlakySession:
+    """Session factory whose first `failures` sessions raise on entry."""
+    def __init__(self, Session, failures: int):
+        self.Session, self.failures = Session, failures
+
+    def __call__(self):
+        if self.failures:
+            self.failures -= 1
+            raise sqlite3.OperationalError("database is locked")
+        return self.Session()
+
+
+def test_failed_flush_keeps_rows_and_events(tmp_path, make_writer):
+    Session = storage.init_db(f"sqlite:///{tmp_path / 'flaky.db'}")
+    w = make_writer(_FlakySession(Session, failures=1), max_age_s=3600)
+    w.add_vital("P1", VITALS)
+    w.add_event("P1", "red", "CRITICAL ALERT", "msg", {})
+    with pytest.raises(sqlite3.OperationalError):
+        w.flush()
+    assert len(w.ring) == 1 and len(w.events_buf) == 1
+    w.flush()
+    assert len(w.ring) == 0 and not w.events_buf
+    with Session() as s:
+        assert s.execute(select(func.count()).select_from(storage.VitalRow.__table__)).scalar() == 1
+        assert s.execute(select(func.count()).select_from(storage.EventRow.__table__)).scalar() == 1
+
+
+def test_drainer_survives_failed_flush(tmp_path, make_writer):
+    Session = storage.init_db(f"sqlite:///{tmp_path / 'drain.db'}")
+    w = make_writer(_FlakySession(Session, failures=2), max_rows=1, max_age_s=0.05)
+    w.add_vital("P1", VITALS)
+    deadline = time.monotonic() + 10
+    while len(w.ring) and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert w._drainer.is_alive() and len(w.ring) == 0
+
+
+def test_get_engine_analyzes_populated_db(tmp_path):
+    url = f"sqlite:///{tmp_path / 'stats.db'}"
+    with get_engine(url).begin() as conn:
+        conn.exec_driver_sql(storage.VITALS_INSERT_SQL, [(f"P{i % 4}", i, 80.0, 120.0, 80.0, 98.0, 36.7) for i in range(5000)])
+        conn.exec_driver_sql("DROP TABLE IF EXISTS sqlite_stat1")
+    storage._ENGINES.pop(url).dispose()
+    with get_engine(url).connect() as conn:   # startup against the populated file
+        stats = dict(conn.exec_driver_sql("SELECT idx, stat FROM sqlite_stat1 WHERE tbl = 'vitals'").all())
+    assert int(stats["ix_vitals_patient_ts"].split()[0]) > 1000   # sampled row estimate
+
+
+def test_close_stops_drainer_and_flushes(tmp_path):
+    Session = storage.init_db(f"sqlite:///{tmp_path / 'close.db'}")
+    w = storage.WriteBuffer(Session, max_age_s=3600)
+    w.add_vital("P1", VITALS)
+    w.close()
+    assert not w._drainer.is_alive() and len(w.ring) == 0
+    with Session() as s:
+        assert s.execute(select(func.count()).select_from(storage.VitalRow.__table__)).scalar() == 1
+
+
+def test_request_flush_wakes_drainer(tmp_path, make_writer):
+    Session = storage.init_db(f"sqlite:///{tmp_path / 'wake.db'}")
+    w = make_writer(Session, max_age_s=3600)
+    w.add_event("P1", "red", "CRITICAL ALERT", "msg", {})
+    w.request_flush()
+    deadline = time.monotonic() + 10
+    while not load_events(Session, "P1")["title"] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert load_events(Session, "P1")["title"] == ["CRITICAL ALERT"]
+
+
+def _statements(engine):
+    """Records every SQL statement the engine sends from here on."""
+    seen = []
+    event.listen(engine, "before_cursor_execute", lambda conn, cur, sql, *a: seen.append(sql))
+    return seen
+
+
+def test_load_events_cache(tmp_path, make_writer):
+    Session = storage.init_db(f"sqlite:///{tmp_path / 'cache.db'}")
+    w = make_writer(Session, max_age_s=3600)
+    w.add_event("P1", "yellow", "Warning", "first", {})
+    w.flush()
+
+    page = load_events(Session, "P1", limit=50)
+    seen = _statements(Session.get_bind())
+    assert load_events(Session, "P1", limit=50) is page   # repeat poll: cached page
+    assert len(seen) == 1                                 # only the MAX(ts) probe ran
+
+    w.add_event("P1", "red", "CRITICAL ALERT", "second", {})
+    w.flush()
+    fresh = load_events(Session, "P1", limit=50)
+    assert fresh is not page and fresh["message"] == ["second", "first"]
+
+    # a different limit is its own entry, not the 50-row page
+    assert load_events(Session, "P1", limit=1)["message"] == ["second"]
+    assert load_events(Session, "P1", limit=50) is fresh
+
+
+def test_load_events_cache_is_bounded(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "_EVENTS_CACHE_MAX", 4)
+    Session = storage.init_db(f"sqlite:///{tmp_path / 'bounded.db'}")
+    for i in range(10):
+        load_events(Session, f"P{i}")
+    assert len(storage._EVENTS_CACHE) <= 4
+
+
+def test_push_many_partial_push_on_deadline():
+    ring = storage.VitalsRingBuffer(capacity=4)
+    states = np.arange(30, dtype=np.float64).reshape(6, 5)
+    t0 = time.monotonic()
+    assert ring.push_many([f"P{i}" for i in range(6)], 123, states, timeout=0.05) == 4
+    assert time.monotonic() - t0 < 1.0   # the deadline covers the whole call, not each row
+    assert ring.push_many(["P9"], 124, states[:1], timeout=0) == 0
+    assert len(ring) == 4
+
+
+def test_add_vitals_batch_round_trips_and_counts_drops(tmp_path, make_writer):
+    Session = storage.init_db(f"sqlite:///{tmp_path / 'batch.db'}")
+    w = make_writer(Session, max_rows=10_000, max_age_s=3600, ring_capacity=8, push_timeout_s=0.01)
+    rng = np.random.default_rng(5)
+    states = rng.uniform(30, 200, size=(5, 5))
+    ids = ["A", "B", "C", "D", "E"]
+    w.add_vitals_batch(ids, states)
+
+    rows = w.ring.read(10)
+    assert [r[0] for r in rows] == ids
+    assert len({r[1] for r in rows}) == 1                    # one tick, one ts
+    assert [list(r[2:]) for r in rows] == states.tolist()    # exact through the <Q5dQ records
+
+    w.add_vitals_batch(ids, states)   # only 3 of these fit
+    assert len(w.ring) == 8 and w.dropped == 2
+
+    w.flush()
+    with Session() as s:
+        stored = s.execute(select(*(storage.VitalRow.__table__.c[c] for c in storage.VITALS_COLUMNS))
+                           .order_by(storage.VitalRow.id)).all()
+    assert [tuple(r) for r in stored[:5]] == rows
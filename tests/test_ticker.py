@@ -0,0 +1,20 @@
+from ticker import PatientTicker
+
+
+def _vitals(patient_id: str, seed: int | None, ticks: int = 20):
+    t = PatientTicker(patient_id, "normal", writer=None, seed=seed, persist=False)
+    out = []
+    for _ in range(ticks):
+        t.tick()
+        out.append(t.latest["vitals"])
+    return out
+
+
+def test_streams_are_reproducible_per_patient():
+    assert _vitals("P001", None) == _vitals("P001", None)
+    assert _vitals("P001", 7) == _vitals("P001", 7)
+
+
+def test_streams_differ_by_patient_and_server_seed():
+    assert _vitals("P001", None) != _vitals("P002", None)
+    assert _vitals("P001", None) != _vitals("P001", 7)
@@ -0,0 +1,93 @@
+from typing import Dict, Any, Tuple
+import logging
+import threading
+import time
+import zlib
+
+import numpy as np
+import pandas as pd
+
+from simulator import VitalState, generate_vitals_raw
+from risk_engine import RollingWindow, patient_thresholds, classify_level, infer_outcomes
+from history import HistoryRing
+
+log = logging.getLogger(__name__)
+
+TITLE_MAP = {"green": "Stable", "yellow": "Warning", "orange": "High Risk", "red": "CRITICAL ALERT"}
+
+class PatientTicker:
+    """
+    Simulates, classifies and (optionally) persists one patient at a fixed
+    cadence on a daemon thread. The dashboard only reads `snapshot()`, so
+    reruns and widget interactions never generate extra ticks.
+    """
+    def __init__(self, patient_id: str, profile: str, writer, interval_s: float = 1.0,
+                 seed: int | None = None, persist: bool = True):
+        self.patient_id = patient_id
+        self.profile = profile
+        self.writer = writer
+        self.interval_s = interval_s
+        self.persist = persist   # process-wide: the ticker is shared by every session
+
+        # per-patient PCG64 stream, reproducible across restarts: keyed on a stable
+        # digest of the id (not hash(), which is salted per process) plus `seed`
+        self.sim_state = VitalState(profile, np.random.default_rng([seed or 0, zlib.crc32(patient_id.encode())]))
+        self.window = RollingWindow(maxlen=120)
+        self.history = HistoryRing(size=300)
+        self.latest: Dict[str, Any] = {}
+        self.lock = threading.Lock()
+        self._thread = threading.Thread(target=self._loop, name=f"ticker-{patient_id}", daemon=True)
+
+    def start(self):
+        self.tick()   # first snapshot is ready before the page renders
+        self._thread.start()
+
+    def tick(self):
+        vitals = generate_vitals_raw(self.profile, self.sim_state)   # rounded only when displayed
+        self.window.push(vitals)
+        rates = self.window.rates_per_min()
+
+        th                    = patient_thresholds(self.profile)
+        level, reasons, score = classify_level(vitals, th, rates)
+        outcomes              = infer_outcomes(vitals, level, reasons)
+
+        title   = TITLE_MAP[level]
+        explain = " | ".join(reasons[:4]) if reasons else "No abnormalities detected."
+
+        row = {
+            "ts": time.time(),
+            "level": level,
+            "risk_score": score,
+            **vitals,
+            "d_hr_per_min":   rates["heart_rate"],
+            "d_spo2_per_min": rates["oxygen_saturation"],
+            "d_sys_per_min":  rates["bp_systolic"],
+            "d_temp_per_min": rates["temperature"],
+        }
+
+        with self.lock:
+            self.history.append(row)
+            self.latest = {
+                "vitals": vitals, "rates": rates, "level": level, "score": score,
+                "title": title, "explain": explain, "outcomes": outcomes,
+            }
+
+        if self.persist:
+            self.writer.add_vital(self.patient_id, vitals)
+            if level in ("yellow", "orange", "red"):
+                self.writer.add_event(self.patient_id, level, title, explain,
+                                      {"vitals": vitals, "rates": rates, "outcomes": outcomes})
+
+    def _loop(self):
+        next_t = time.monotonic()
+        while True:
+            next_t += self.interval_s
+            time.sleep(max(0.0, next_t - time.monotonic()))
+            try:
+                self.tick()
+            except Exception:   # one bad tick must not freeze this patient for every session
+                log.exception("tick failed for patient %s", self.patient_id)
+
+    def snapshot(self, last: int = 100) -> Tuple[Dict[str, Any], pd.DataFrame]:
+        with self.lock:
+            return self.latest, self.history.to_frame(last=last)